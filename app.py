@@ -19,18 +19,38 @@ st.markdown("""
 """)
 
 # --- Data Loading ---
+@st.cache_data
+def load_df():
+    """
+    Loads the master analysis CSV once and casts the repeated string columns to categoricals.
+    Also returns a fingerprint of the lower-cased words by row position, which keys the word lookup index.
+    """
+    data_frame = pd.read_csv(
+        "all_poems_analysis_master.csv",
+        engine='pyarrow',
+        dtype={'Poem Name': 'string', 'Word Type': 'string', 'Word': 'string', 'POS_Tag': 'string'}
+    )
+
+    # Ensure relevant columns are strings and strip whitespace
+    data_frame['Word Type'] = data_frame['Word Type'].astype(str).str.strip()
+    data_frame['POS_Tag'] = data_frame['POS_Tag'].astype(str).str.strip()
+
+    for column in ['Poem Name', 'Word Type', 'POS_Tag', 'Word']:
+        data_frame[column] = data_frame[column].astype('category')
+
+    # Lower-cased words for the case-insensitive lookup, computed once instead of per search
+    data_frame['Word_lower'] = data_frame['Word'].str.lower().astype('category')
+    word_index_key = int(pd.util.hash_pandas_object(data_frame['Word_lower'], index=True).sum())
+    return data_frame, word_index_key
+
 try:
-    df = pd.read_csv("all_poems_analysis_master.csv")
+    df, word_index_key = load_df()
 except FileNotFoundError:
     st.error("Error: 'all_poems_analysis_master.csv' not found. Please ensure that 'articutExtract.py' has been run successfully to generate this file, and it is in the same directory as this Streamlit app.")
     st.stop()
 
-# Ensure relevant columns are strings and strip whitespace
-df['Word Type'] = df['Word Type'].astype(str).str.strip()
-df['POS_Tag'] = df['POS_Tag'].astype(str).str.strip()
-
 # Get unique poem names
-poem_names = df['Poem Name'].unique()
+poem_names = df['Poem Name'].unique().tolist()
 
 if len(poem_names) < 2:
     st.error(f"Only {len(poem_names)} poem(s) found in the data. Comparison analyses require at least two poems. Please ensure your 'all_poems_analysis_master.csv' contains data for multiple poems.")
@@ -47,12 +67,38 @@ def get_feature_frequencies(data_frame, feature_col_display_name):
     if feature_col_display_name == "POS Tag":
         actual_column_name = "POS_Tag"
 
-    feature_counts = data_frame.groupby('Poem Name')[actual_column_name].value_counts().unstack(fill_value=0)
-    feature_counts = feature_counts.fillna(0)
-    feature_freq = feature_counts.apply(lambda x: x / x.sum(), axis=1)
-    feature_freq = feature_freq.fillna(0)
+    # Count (poem, feature) pairs with a single bincount over the factorized codes
+    poem_codes, poem_labels = pd.factorize(data_frame['Poem Name'], sort=True)
+    feature_codes, feature_labels = pd.factorize(data_frame[actual_column_name], sort=True)
+    valid = (poem_codes >= 0) & (feature_codes >= 0)
+    n_poems, n_features = len(poem_labels), len(feature_labels)
+    counts = np.bincount(
+        poem_codes[valid] * n_features + feature_codes[valid],
+        minlength=n_poems * n_features
+    ).reshape(n_poems, n_features)
+
+    row_totals = counts.sum(axis=1, keepdims=True)
+    proportions = np.divide(counts, row_totals, out=np.zeros(counts.shape), where=row_totals > 0)
+
+    feature_freq = pd.DataFrame(
+        proportions,
+        index=pd.Index(poem_labels, name='Poem Name'),
+        columns=pd.Index(feature_labels, name=actual_column_name)
+    )
     return feature_freq
 
+# --- Word Lookup Index (Helper Function) ---
+@st.cache_resource
+def get_word_index(_data_frame, word_index_key):
+    """
+    Builds an inverted index mapping each lower-cased word to the row positions where it occurs.
+    The leading underscore stops Streamlit from hashing the whole DataFrame on every rerun;
+    the cheap `word_index_key` from load_df() identifies its contents instead, so a reloaded
+    or changed DataFrame gets a fresh index rather than stale row positions.
+    Cached as a resource so the (read-only) index is shared rather than copied on each search.
+    """
+    return _data_frame.groupby('Word_lower', observed=True).indices
+
 # --- Sidebar for Analysis Options ---
 st.sidebar.header("Analysis Options")
 analysis_type = st.sidebar.radio(
@@ -88,6 +134,9 @@ st.sidebar.caption("App created by Cindy Lee")
 # Get feature frequencies based on selected analysis type
 feature_freq_df = get_feature_frequencies(df, analysis_type)
 
+# Order features by overall proportion once; reused when slicing for the charts
+feature_order = feature_freq_df.sum(axis=0).sort_values(ascending=False).index
+
 # --- Section 1: Linguistic Distributions by Poem ---
 st.header(f"Linguistic Distributions by Poem ({analysis_type})")
 st.markdown("*Compare the proportion of linguistic features across selected poems*")
@@ -100,30 +149,19 @@ selected_poems_for_dist_chart = st.multiselect(
 )
 
 if len(selected_poems_for_dist_chart) > 0:
-    dist_chart_data = feature_freq_df.loc[selected_poems_for_dist_chart].reset_index()
-
-    dist_chart_data_melted = dist_chart_data.melt(
-        id_vars='Poem Name',
-        var_name='Feature',
-        value_name='Proportion'
-    )
-
-    non_zero_features_dist = dist_chart_data_melted.groupby('Feature')['Proportion'].sum()
-    features_to_keep_dist = non_zero_features_dist[non_zero_features_dist > 0].index
-    dist_chart_data_melted = dist_chart_data_melted[dist_chart_data_melted['Feature'].isin(features_to_keep_dist)]
+    # Slice the wide frame in feature order and drop features absent from every selected poem
+    dist_chart_data = feature_freq_df.loc[selected_poems_for_dist_chart, feature_order]
+    dist_chart_data = dist_chart_data.loc[:, dist_chart_data.sum(axis=0) > 0]
 
-    feature_order_dist = feature_freq_df.sum().sort_values(ascending=False).index.tolist()
-    dist_chart_data_melted['Feature'] = pd.Categorical(dist_chart_data_melted['Feature'], categories=feature_order_dist, ordered=True)
-    dist_chart_data_melted = dist_chart_data_melted.sort_values('Feature')
+    # Plot the wide frame directly: one row per feature, one column (bar colour) per poem
+    dist_chart_data = dist_chart_data.T.rename_axis('Feature')
 
     fig = px.bar(
-        dist_chart_data_melted,
-        x='Feature',
-        y='Proportion',
-        color='Poem Name',
+        dist_chart_data,
+        y=list(dist_chart_data.columns),
         barmode='group',
         title=f'{analysis_type} Distribution Comparison',
-        labels={'Proportion': 'Proportion of Words', 'Feature': analysis_type},
+        labels={'value': 'Proportion of Words', 'variable': 'Poem Name', 'Feature': analysis_type},
         height=500
     )
     fig.update_xaxes(tickangle=45)
@@ -158,11 +196,10 @@ selected_features_for_radar = st.multiselect(
 if len(selected_poems_for_radar) > 0 and len(selected_features_for_radar) > 0:
     # Filter radar_data based on selected poems and selected features
     radar_data = feature_freq_df.loc[selected_poems_for_radar, selected_features_for_radar].reset_index()
-    radar_data_melted = radar_data.melt(id_vars='Poem Name', var_name='Feature', value_name='Proportion')
 
-    # Ensure features are in the order selected by the user for the axes
-    radar_data_melted['Feature'] = pd.Categorical(radar_data_melted['Feature'], categories=selected_features_for_radar, ordered=True)
-    radar_data_melted = radar_data_melted.sort_values('Feature')
+    # line_polar only takes long-form data; melting column by column keeps the
+    # features in the order selected by the user for the axes
+    radar_data_melted = radar_data.melt(id_vars='Poem Name', var_name='Feature', value_name='Proportion')
 
     fig_radar = px.line_polar(radar_data_melted,
                               r="Proportion",
@@ -193,10 +230,16 @@ selected_poems_for_lookup = st.multiselect(
 )
 
 if search_word:
-    # Start with the full DataFrame, then filter by poem if needed
-    df_to_search = df.copy()
+    # Look up the rows whose word matches case-insensitively
+    matching_rows = get_word_index(df, word_index_key).get(search_word.lower(), np.array([], dtype=np.intp))
+
+    # Filter by poem if needed, comparing category codes rather than strings
     if selected_poems_for_lookup:
-        df_to_search = df_to_search[df_to_search['Poem Name'].isin(selected_poems_for_lookup)]
+        poem_column = df['Poem Name']
+        selected_poem_codes = poem_column.cat.categories.get_indexer(selected_poems_for_lookup)
+        matching_rows = matching_rows[np.isin(poem_column.cat.codes.to_numpy()[matching_rows], selected_poem_codes)]
+
+    df_to_search = df.take(matching_rows)
 
     # Define POS tags that require case-sensitive search
     case_sensitive_pos_tags = ['ENTITY_nouny', 'LOCATION', 'ENTITY_oov']
@@ -208,15 +251,10 @@ if search_word:
     # Mask for exact case-sensitive word match
     match_case_sensitive = (df_to_search['Word'] == search_word)
 
-    # Mask for case-insensitive word match
-    match_case_insensitive = (df_to_search['Word'].str.lower() == search_word.lower())
-
-    # Combine the masks:
-    # 1. (If POS is case-sensitive AND word matches case-sensitively) OR
-    # 2. (If POS is NOT case-sensitive AND word matches case-insensitively)
-    final_search_mask = \
-        (is_case_sensitive_pos & match_case_sensitive) | \
-        (~is_case_sensitive_pos & match_case_insensitive)
+    # Every candidate already matches case-insensitively, so keep it if:
+    # 1. (POS is case-sensitive AND word matches case-sensitively) OR
+    # 2. (POS is NOT case-sensitive)
+    final_search_mask = match_case_sensitive | ~is_case_sensitive_pos
 
     search_results = df_to_search[final_search_mask]
 
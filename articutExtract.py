@@ -1,66 +1,29 @@
 import csv
+import hashlib
 import json
+import os
 import re
-from requests import post
+import sqlite3
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from itertools import repeat
+from requests import Session
+from requests.adapters import HTTPAdapter
 from pprint import pprint
-import nltk
-from nltk.tokenize import sent_tokenize
-import time
-
-# Download the 'punkt' tokenizer data if you haven't already
-# This is typically done once.
-try:
-    nltk.data.find('tokenizers/punkt')
-except nltk.downloader.DownloadError:
-    nltk.download('punkt')
-    print("NLTK 'punkt' tokenizer downloaded.")
-
-
-# --- CSV Saving Function ---
-def save_to_csv(data, filename, headers=None, mode='w'):
-    """
-    Saves a list of data to a CSV file.
-
-    Args:
-        data (list): The data to save. Can be:
-                     - A list of lists (each inner list is a row).
-                     - A list of dictionaries (keys become headers).
-                     - A simple list of items (each item becomes a row in a single column).
-        filename (str): The name of the CSV file to create or append to.
-        headers (list, optional): A list of strings to use as column headers.
-                                 If data is a list of dictionaries and headers is None,
-                                 headers will be inferred from dictionary keys.
-                                 Defaults to None.
-        mode (str, optional): The file open mode ('w' for write/overwrite, 'a' for append).
-                              Defaults to 'w'.
-    """
-    if not data:
-        return
-
-    try:
-        if isinstance(data[0], dict):
-            if headers is None:
-                headers = list(data[0].keys())
-
-            with open(filename, mode, newline='', encoding='utf-8') as csvfile:
-                writer = csv.DictWriter(csvfile, fieldnames=headers)
-                if mode == 'w':
-                    writer.writeheader()
-                writer.writerows(data)
-        else:
-            processed_data = []
-            if not isinstance(data[0], list):
-                processed_data = [[item] for item in data]
-            else:
-                processed_data = data
-
-            with open(filename, mode, newline='', encoding='utf-8') as csvfile:
-                writer = csv.writer(csvfile)
-                if headers and mode == 'w':
-                    writer.writerow(headers)
-                writer.writerows(processed_data)
-    except Exception as e:
-        print(f"An error occurred while saving to CSV: {e}")
+import pandas as pd
+
+# --- Precompiled Text Patterns ---
+BRACKETED_NUMBER_PATTERN = re.compile(r'\[\d+\]')
+FOOTER_LINE_PATTERN = re.compile(r'.*? lines \[\d+–\d+\] \x18{2}', re.IGNORECASE)
+# Excess whitespace and non-breaking spaces, both replaced by a single space in one pass
+WHITESPACE_PATTERN = re.compile(r'\s{2,}|\xa0')
+# Sentence boundaries: whitespace after . ! or ? (optionally closing a quotation) that precedes
+# a capitalized word. The translator's editorial glosses like "[i.e. Gawain]" are the only
+# abbreviations in the text, so "i.e." (and "e.g.") never end a sentence.
+SENTENCE_SPLIT_PATTERN = re.compile(
+    r'(?:(?<=[.!?])|(?<=[.!?]["\'’”]))(?<!\b[iI]\.[eE]\.)(?<!\b[eE]\.[gG]\.)\s+(?=["\'‘“]?[A-Z])'
+)
 
 # --- Load Configuration ---
 with open('config.json', 'r', encoding='utf-8') as file:
@@ -74,16 +37,11 @@ def clean_poem_text(raw_text):
     - Specific footer lines "Sir Gawain and the Green Knight lines [X–Y] " (generalized for other poems)
     - Excess whitespace and special characters.
     """
-    cleaned_text = raw_text
-
-    cleaned_text = re.sub(r'\[\d+\]', '', cleaned_text)
-    cleaned_text = re.sub(r'.*? lines \[\d+–\d+\] {2}', '', cleaned_text, flags=re.IGNORECASE)
-    cleaned_text = cleaned_text.replace('', '')
-    cleaned_text = cleaned_text.replace('\xa0', ' ')
-    cleaned_text = re.sub(r'\s{2,}', ' ', cleaned_text)
-    cleaned_text = cleaned_text.strip()
-
-    return cleaned_text
+    cleaned_text = BRACKETED_NUMBER_PATTERN.sub('', raw_text)
+    cleaned_text = FOOTER_LINE_PATTERN.sub('', cleaned_text)
+    cleaned_text = cleaned_text.replace('\x18\x18', '')
+    cleaned_text = WHITESPACE_PATTERN.sub(' ', cleaned_text)
+    return cleaned_text.strip()
 
 # --- List of poem files ---
 poem_files = {
@@ -111,6 +69,14 @@ for poem_name, file_path in poem_files.items():
     except Exception as e:
         print(f"An error occurred while processing {poem_name}: {e}")
 
+# --- Shared HTTP Session ---
+# Reuses TCP/TLS connections to the Articut API across batches instead of reconnecting per request.
+# The pool is sized to match the number of concurrent API requests.
+API_CONNECTION_POOL_SIZE = 8
+
+articut_session = Session()
+articut_session.mount("https://", HTTPAdapter(pool_connections=API_CONNECTION_POOL_SIZE, pool_maxsize=API_CONNECTION_POOL_SIZE))
+
 # --- Direct Articut API Call Function ---
 def call_articut_api(input_str, username, api_key, level="lv2", version="latest"):
     """
@@ -135,7 +101,7 @@ def call_articut_api(input_str, username, api_key, level="lv2", version="latest"
         "version": version
     }
     try:
-        response = post(url, json=payload).json()
+        response = articut_session.post(url, json=payload, timeout=30).json()
         if response.get("status") == True:
             return response
         else:
@@ -147,85 +113,230 @@ def call_articut_api(input_str, username, api_key, level="lv2", version="latest"
         print(f"Network or API request error: {e} for input (first 100 chars): '{input_str[:100]}...'")
         return None
 
+# --- Rate Limiting for Concurrent API Calls ---
+class RateLimiter:
+    """
+    Allows at most `max_calls` acquisitions within any `period`-second window, shared across threads.
+    Each acquired token is handed back by a timer thread once `period` seconds have passed.
+    """
+    def __init__(self, max_calls, period):
+        self._semaphore = threading.Semaphore(max_calls)
+        self._period = period
+        self._closed = threading.Event()
+
+    def acquire(self):
+        """
+        Blocks until a token is free. Returns False without a token if the limiter is closed
+        before or while waiting, so callers can skip their request.
+        """
+        while not self._closed.is_set():
+            if self._semaphore.acquire(timeout=0.1):
+                release_timer = threading.Timer(self._period, self._semaphore.release)
+                release_timer.daemon = True
+                release_timer.start()
+                return True
+        return False
+
+    def close(self):
+        """
+        Wakes up every thread waiting in acquire() and refuses any further tokens.
+        """
+        self._closed.set()
+
+# The Articut API allows 80 requests/minute across the whole workflow.
+# We are making 1 request per batch, with several batches in flight at once.
+# Tokens are counted when a request is sent, not when the server receives it, so network
+# jitter could push an 81st request into the server's window. Using 75 for a safer margin.
+API_REQUESTS_PER_MINUTE = 75
+MAX_CONCURRENT_REQUESTS = API_CONNECTION_POOL_SIZE
+
+rate_limiter = RateLimiter(API_REQUESTS_PER_MINUTE, 60)
+
+# --- On-Disk Cache for Articut API Responses ---
+# Re-runs reuse the stored response for any batch whose input is unchanged,
+# skipping both the request and its rate limit token.
+API_CACHE_PATH = ".articut_cache.sqlite"
+
+api_cache_connection = sqlite3.connect(API_CACHE_PATH, check_same_thread=False)
+api_cache_connection.execute("CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, response TEXT NOT NULL)")
+api_cache_lock = threading.Lock()
+
+def get_api_cache_key(input_str, level, version):
+    """
+    Hashes the API input (and the options that affect the response) into a cache key.
+    """
+    return hashlib.sha1(f"{level}\n{version}\n{input_str}".encode('utf-8')).hexdigest()
+
+def load_cached_response(cache_key):
+    """
+    Returns the cached API response dictionary for `cache_key`, or None if it has not been stored.
+    """
+    with api_cache_lock:
+        row = api_cache_connection.execute("SELECT response FROM responses WHERE key = ?", (cache_key,)).fetchone()
+    return json.loads(row[0]) if row else None
+
+def store_cached_response(cache_key, response):
+    """
+    Saves a successful API response dictionary under `cache_key`.
+    """
+    with api_cache_lock:
+        with api_cache_connection:
+            api_cache_connection.execute("INSERT OR REPLACE INTO responses (key, response) VALUES (?, ?)", (cache_key, json.dumps(response)))
+
+def analyze_batch(batch_input_str, level="lv2", version="latest"):
+    """
+    Returns the cached response for this batch if there is one; otherwise waits for a
+    rate limit token, sends the batch to the Articut API and caches a successful response.
+    """
+    cache_key = get_api_cache_key(batch_input_str, level, version)
+    cached_response = load_cached_response(cache_key)
+    if cached_response is not None:
+        return cached_response
+
+    if not rate_limiter.acquire():
+        return None
+    response = call_articut_api(batch_input_str, config_data["username"], config_data["apikey"], level=level, version=version)
+    if response:
+        store_cached_response(cache_key, response)
+    return response
+
+# --- Word Type Classification ---
+# These categorizations are based on common Articut POS tags.
+# Adjust or expand this mapping based on precise Articut documentation
+# for each specific tag if you need more accuracy or detail.
+POS_PREFIX_TO_WORD_TYPE = {
+    "ACTION_verb": "Verb",
+    "VerbP": "Verb",
+    "MODAL": "Verb",
+    "ENTITY_noun": "Noun",
+    "NOUN_common": "Noun",
+    "NOUN_prop": "Noun",
+    "ENTITY_location": "Location",
+    "ENTITY_person": "Person",
+    "ENTITY_time": "Time",
+    "QUANTITY_duration": "Duration",
+    "QUANTITY_ordinal": "Ordinal",
+    "ENTITY_food": "Food",
+    "ENTITY_pronoun": "Pronoun"
+}
+# Longest prefixes first so the most specific prefix wins
+POS_PREFIXES = sorted(POS_PREFIX_TO_WORD_TYPE, key=len, reverse=True)
+POS_PREFIX_PATTERN = r'^(' + '|'.join(re.escape(prefix) for prefix in POS_PREFIXES) + r')'
+
+def classify_word_types(pos_tags):
+    """
+    Maps a Series of Articut POS tags to simplified word types in one vectorized pass.
+
+    Args:
+        pos_tags (pd.Series): The raw POS tags from the Articut API (may contain None).
+
+    Returns:
+        pd.Series: The word types, with "General Word" where no specific match is found.
+    """
+    word_types = pos_tags.str.extract(POS_PREFIX_PATTERN, expand=False).map(POS_PREFIX_TO_WORD_TYPE)
+    word_types = word_types.mask(pos_tags.str.upper() == 'COLOR', "Color") # Assuming LV2 might also tag colors
+    return word_types.fillna("General Word")
+
+# --- Writing Batch Results ---
+# At most this many batches are submitted ahead of the CSV writer, so only a bounded
+# number of Articut responses are held in memory at once.
+MAX_PENDING_BATCHES = 2 * MAX_CONCURRENT_REQUESTS
+
+def write_batch_result(writer, poem_name, total_batches, pending_batch):
+    """
+    Waits for one batch's API response, classifies its words and writes them as master CSV rows.
+
+    Args:
+        writer (csv.writer): The master CSV writer.
+        poem_name (str): The poem the batch belongs to.
+        total_batches (int): The poem's number of batches, for progress output.
+        pending_batch (tuple): (batch number, sentence count, Future of the API response).
+
+    Returns:
+        int: The number of rows written.
+    """
+    batch_num, batch_sentence_count, batch_future = pending_batch
+    print(f"  Processing batch {batch_num}/{total_batches} of {poem_name} ({batch_sentence_count} sentences)...")
+
+    resultDICT = batch_future.result()
+
+    # --- Process result_obj from API calls ---
+    if not (resultDICT and resultDICT.get('result_obj')):
+        return 0
+
+    batch_words = pd.DataFrame(
+        [(word_data.get('text'), word_data.get('pos')) for sentence_obj in resultDICT['result_obj'] for word_data in sentence_obj],
+        columns=['Word', 'POS_Tag'],
+        dtype=object
+    )
+    # Word types are classified in bulk for the whole batch
+    batch_word_types = classify_word_types(batch_words['POS_Tag'])
+    writer.writerows(zip(repeat(poem_name), batch_word_types, batch_words['Word'], batch_words['POS_Tag']))
+    return len(batch_words)
+
 # --- Analyze each cleaned poem with Direct Articut API Call and prepare data for Master CSV ---
 print("\n--- Articut Analysis ---")
 
-all_poems_master_data = []
 master_csv_headers = ['Poem Name', 'Word Type', 'Word', 'POS_Tag']
+MASTER_CSV_PATH = "all_poems_analysis_master.csv"
+# Rows are streamed here batch by batch instead of being accumulated in memory; the existing
+# master CSV is only replaced once every poem has been written successfully.
+MASTER_CSV_TEMP_PATH = MASTER_CSV_PATH + ".tmp"
 
-# Define the delay between API calls (in seconds) to respect the 80 requests/minute limit.
-# We are making 1 request per batch.
-# 60 seconds / 80 requests = 0.75 seconds per request.
-# Using 0.8 seconds for a safer margin.
-DELAY_BETWEEN_BATCHES = 0.8
-
-for poem_name, cleaned_text in processed_poems.items():
-    print(f"\nAnalyzing '{poem_name}' with Articut (direct API call)...")
-
-    sentences = sent_tokenize(cleaned_text)
-    print(f"'{poem_name}' has {len(sentences)} sentences.")
-
-    sentence_batch_size = 10
-    total_batches = (len(sentences) + sentence_batch_size - 1) // sentence_batch_size # Calculate total batches
-
-    for i in range(0, len(sentences), sentence_batch_size):
-        batch_num = i // sentence_batch_size + 1
-        batch_sentences = sentences[i:i + sentence_batch_size]
-        # Join sentences to form a single string for the API call
-        batch_input_str = " ".join(batch_sentences)
-
-        print(f"  Processing batch {batch_num}/{total_batches} of {poem_name} ({len(batch_sentences)} sentences)...")
-
-        # Perform direct API calls for the current batch
-        resultDICT = call_articut_api(batch_input_str, config_data["username"], config_data["apikey"], level="lv2")
-
-        # --- Process result_obj from API calls ---
-        if resultDICT and resultDICT.get('result_obj'):
-            for sentence_obj in resultDICT['result_obj']:
-                for word_data in sentence_obj:
-                    word = word_data.get('text')
-                    pos_tag = word_data.get('pos')
-                    word_type = "General Word" # Default type if no specific match
-
-                    # --- Simplified Logic for Word Types ---
-                    # These categorizations are based on common Articut POS tags.
-                    # Adjust or expand this logic based on precise Articut documentation
-                    # for each specific tag if you need more accuracy or detail.
-                    if pos_tag and (pos_tag.startswith("ACTION_verb") or pos_tag.startswith("VerbP") or pos_tag.startswith("MODAL")):
-                        word_type = "Verb"
-                    elif pos_tag and (pos_tag.startswith("ENTITY_noun") or pos_tag.startswith("NOUN_common") or pos_tag.startswith("NOUN_prop")):
-                        word_type = "Noun"
-                    elif pos_tag and pos_tag.startswith("ENTITY_location"):
-                        word_type = "Location"
-                    elif pos_tag and pos_tag.startswith("ENTITY_person"):
-                        word_type = "Person"
-                    elif pos_tag and pos_tag.startswith("ENTITY_time"):
-                        word_type = "Time"
-                    elif pos_tag and pos_tag.startswith("QUANTITY_duration"):
-                        word_type = "Duration"
-                    elif pos_tag and pos_tag.startswith("QUANTITY_ordinal"):
-                        word_type = "Ordinal"
-                    elif pos_tag and pos_tag.startswith("ENTITY_food"):
-                        word_type = "Food"
-                    elif pos_tag and pos_tag.startswith("ENTITY_pronoun"):
-                        word_type = "Pronoun"
-                    elif pos_tag and pos_tag.upper() == 'COLOR': # Assuming LV2 might also tag colors
-                        word_type = "Color"
-
-                    all_poems_master_data.append({
-                        'Poem Name': poem_name,
-                        'Word Type': word_type,
-                        'Word': word,
-                        'POS_Tag': pos_tag # Include the raw POS tag for more context
-                    })
-
-        # --- Add the delay here to prevent rate limiting ---
-        # Only sleep if there are more batches to process, to avoid an unnecessary delay at the very end
-        if batch_num < total_batches:
-            time.sleep(DELAY_BETWEEN_BATCHES)
-            print(f"  Waiting for {DELAY_BETWEEN_BATCHES} seconds to respect API rate limit...")
-
-# --- Save all accumulated data to one master CSV file ---
-print("\n--- Saving all analysis data from all poems to a single master CSV file ---")
-save_to_csv(all_poems_master_data, "all_poems_analysis_master.csv", headers=master_csv_headers, mode='w')
-print("Master CSV creation complete. No individual CSVs generated.")
\ No newline at end of file
+total_rows_written = 0
+
+executor = ThreadPoolExecutor(max_workers=MAX_CONCURRENT_REQUESTS)
+
+try:
+    with open(MASTER_CSV_TEMP_PATH, 'w', newline='', encoding='utf-8') as master_csv_file:
+        master_writer = csv.writer(master_csv_file)
+        master_writer.writerow(master_csv_headers)
+
+        for poem_name, cleaned_text in processed_poems.items():
+            print(f"\nAnalyzing '{poem_name}' with Articut (direct API call)...")
+
+            sentences = [sentence for sentence in SENTENCE_SPLIT_PATTERN.split(cleaned_text) if sentence]
+            print(f"'{poem_name}' has {len(sentences)} sentences.")
+
+            sentence_batch_size = 10
+            total_batches = (len(sentences) + sentence_batch_size - 1) // sentence_batch_size # Calculate total batches
+
+            # Submit batches in order, writing out the oldest one (in batch order, so the CSV rows keep
+            # the poem's word order) whenever too many are pending. Consumed batches are popped from the
+            # deque so their responses can be freed.
+            pending_batches = deque()
+            for i in range(0, len(sentences), sentence_batch_size):
+                if len(pending_batches) >= MAX_PENDING_BATCHES:
+                    total_rows_written += write_batch_result(master_writer, poem_name, total_batches, pending_batches.popleft())
+
+                batch_num = i // sentence_batch_size + 1
+                batch_sentences = sentences[i:i + sentence_batch_size]
+                # Join sentences to form a single string for the API call
+                batch_input_str = " ".join(batch_sentences)
+                pending_batches.append((batch_num, len(batch_sentences), executor.submit(analyze_batch, batch_input_str)))
+
+            while pending_batches:
+                total_rows_written += write_batch_result(master_writer, poem_name, total_batches, pending_batches.popleft())
+
+            master_csv_file.flush()
+            print(f"Wrote analysis data for '{poem_name}'.")
+
+    executor.shutdown()
+
+    # --- Replace the master CSV file only with a complete, non-empty analysis ---
+    if total_rows_written:
+        os.replace(MASTER_CSV_TEMP_PATH, MASTER_CSV_PATH)
+        print("\nMaster CSV creation complete. No individual CSVs generated.")
+    else:
+        print(f"\nNo analysis data was collected; '{MASTER_CSV_PATH}' was left unchanged.")
+except BaseException:
+    # On an error or Ctrl-C, stop right away instead of waiting for pending batches,
+    # which may be blocked on the rate limiter for up to a minute
+    rate_limiter.close()
+    executor.shutdown(wait=False, cancel_futures=True)
+    raise
+finally:
+    with api_cache_lock:
+        api_cache_connection.close()
+    if os.path.exists(MASTER_CSV_TEMP_PATH):
+        os.remove(MASTER_CSV_TEMP_PATH)
@@ -1,43 +1,62 @@
 import os
 import re
+from concurrent.futures import ProcessPoolExecutor
 
 from PyPDF2 import PdfReader
 
-# extracts text from pdf
+# precompiled cleanup patterns
+PAGE_NUMBER_PATTERN = re.compile(r"^\d+\s*$", flags=re.MULTILINE)
+FOOTER_PATTERN = re.compile(r"^\d+\s+[A-Za-z\s]+lines\s*\[\d+.*?\]\s*$",
+                            flags=re.MULTILINE)
+BLANK_LINES_PATTERN = re.compile(r"\n{3,}")
+INLINE_WHITESPACE_PATTERN = re.compile(r"[ \t]+")
+
+# title lines at the start of each poem
+TITLE_PATTERNS = {
+    "Pearl": re.compile(r"^Pearl\s*I?\s*", flags=re.IGNORECASE),
+    "Cleanness": re.compile(r"^Cleanness\s*", flags=re.IGNORECASE),
+    "Patience": re.compile(r"^Patience\s*", flags=re.IGNORECASE),
+    "Sir Gawain": re.compile(r"^Sir Gawain and the\s*Green Knight\s*I?\s*",
+                             flags=re.IGNORECASE)
+}
+
+# pdf reader opened once in each worker process
+worker_reader = None
+
+def init_worker_reader(file_path):
+    global worker_reader
+    worker_reader = PdfReader(file_path)
+
+# extracts text from one page in a worker process
+def extract_page_text(page_num):
+    return worker_reader.pages[page_num].extract_text()
+
+# extracts text from pdf; pages are independent, so extract them in parallel
 def extract_text(file_path):
-    reader = PdfReader(file_path)
+    num_pages = len(PdfReader(file_path).pages)
 
-    full_text = ""
-    for page_num, page in enumerate(reader.pages):
-        text = page.extract_text()
-        if text:
-            full_text += text + "\n"
+    with ProcessPoolExecutor(initializer=init_worker_reader,
+                             initargs=(file_path,)) as executor:
+        page_texts = executor.map(extract_page_text, range(num_pages))
+
+        # join once instead of growing the string page by page
+        full_text = "".join(text + "\n" for text in page_texts if text)
 
     return full_text
 
 # clean and format poem text
 def clean_text(text, poem_name):
     # remove page num + headers/footers
-    text = re.sub(r"^\d+\s*$", "", text,
-                   flags=re.MULTILINE)
-    text = re.sub(r"^\d+\s+[A-Za-z\s]+lines\s*\[\d+.*?\]\s*$",
-                   "", text, flags=re.MULTILINE)
+    text = PAGE_NUMBER_PATTERN.sub("", text)
+    text = FOOTER_PATTERN.sub("", text)
 
     # remove extra whitespace
-    text = re.sub(r"\n{3,}", "\n\n", text)
-    text = re.sub(r"[ \t]+", " ", text)
+    text = BLANK_LINES_PATTERN.sub("\n\n", text)
+    text = INLINE_WHITESPACE_PATTERN.sub(" ", text)
 
     # remove title lines
-    title_patterns = {
-        "Pearl": r"^Pearl\s*I?\s*",
-        "Cleanness": r"^Cleanness\s*",
-        "Patience": r"^Patience\s*",
-        "Sir Gawain": r"^Sir Gawain and the\s*Green Knight\s*I?\s*"
-    }
-
-    if poem_name in title_patterns:
-        text = re.sub(title_patterns[poem_name], "", text,
-                       flags=re.IGNORECASE)
+    if poem_name in TITLE_PATTERNS:
+        text = TITLE_PATTERNS[poem_name].sub("", text)
     
     return text.strip()
 